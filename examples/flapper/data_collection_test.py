@@ -6,15 +6,28 @@ ESC to land at any time.
 """
 
 import json
-from functools import partial
-from time import sleep, time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic_ns, sleep, time
 
+import numpy as np
 import pynput
 from cflib.crazyflie.log import LogConfig
 from cflib.crazyflie.syncLogger import SyncLogger
 
 from qfly import Pose, QualisysCrazyflie, World, utils
 
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Key members are singletons, so an identity check suffices
+_ESC = pynput.keyboard.Key.esc
+
 # SETTINGS
 cf_body_name = "flapper_passive"  # QTM rigid body name
 cf_uri = "radio://0/80/2M/E7E7E7E7E7"  # Crazyflie address
@@ -23,28 +36,87 @@ circle_radius = 0.5  # Radius of the circular flight path
 circle_speed_factor = 0.12  # How fast the Crazyflie should move along circle
 qtm_ip = "128.174.245.190"
 sampling_rate = 0.1  # Hz
+# Crazyflie firmware expects the log period as an integer multiple of
+# 10 ms; passing the raw float risked silent rounding in the SDK
+_PERIOD_MS = max(10, int(round(sampling_rate * 1000 / 10)) * 10)
+flight_sec = 40  # Duration of the main flight loop
 last_saved_t = time()
 save_freq = 0.1
-# Watch key presses with a global variable
-last_key_pressed = None
+# Signal Esc to the main loop with an atomic event; Event.is_set() is a
+# single C-level read, and the old global-assignment approach set a local
+# `fly` variable that did nothing
+stop_event = threading.Event()
 
 
 # Set up keyboard callback
 def on_press(key):
     """React to keyboard."""
-    global last_key_pressed
-    last_key_pressed = key
-    if key == pynput.keyboard.Key.esc:
-        fly = False
+    if key is _ESC:
+        stop_event.set()
+
+
+class LogCallback:
+    """
+    Per-block telemetry callback. A plain class with __slots__ avoids the
+    keyword-dict merge functools.partial performs on every invocation, and
+    it does no printing or formatting in the radio callback. A block may
+    carry several packed groups; each is routed to its own ring buffer.
+    """
+
+    __slots__ = ("bufs", "counts", "group_vars")
 
+    def __init__(self, bufs, counts, group_vars):
+        self.bufs = bufs
+        self.counts = counts
+        # group_vars: list of (group key, [variable names]) in the block
+        self.group_vars = group_vars
 
-def log_callback(timestamp, data, logconf, data_log, key):
-    print(f"{timestamp}, {data}, {logconf.name}")
-    data_log[key].append(data)
+    def __call__(self, timestamp, data, logconf):
+        for key, names in self.group_vars:
+            row = [data[name] for name in names]
+            buf = self.bufs[key]
+            buf[self.counts[key] % len(buf)] = row
+            self.counts[key] += 1
+            try:
+                record_queue.put_nowait((key, timestamp, row))
+            except queue.Full:
+                # The ring buffer keeps the authoritative recent history;
+                # drop the disk copy rather than grow the heap unbounded
+                pass
+
+
+def write_json(data, path):
+    """Serialize the collected data compactly; orjson when available."""
+    if HAS_ORJSON:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data))
+    else:
+        with open(path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+
+def drain_records(record_queue, path, batch_size=100):
+    """Write queued telemetry records to disk, off the radio callback thread."""
+    with open(path, "w") as f:
+        pending = 0
+        while True:
+            item = record_queue.get()
+            if item is None:
+                break
+            key, timestamp, row = item
+            f.write(json.dumps({"t": timestamp, "group": key, "values": row}) + "\n")
+            pending += 1
+            if pending >= batch_size:
+                f.flush()
+                pending = 0
 
 
 # position, velocity, time, control
 data = {}
+# Callbacks hand records to a background writer through this queue so the
+# radio callback never blocks on file I/O; bounded so a stalled disk
+# cannot grow the heap without limit
+record_queue = queue.Queue(maxsize=1000)
 # Listen to the keyboard
 listener = pynput.keyboard.Listener(on_press=on_press)
 listener.start()
@@ -53,179 +125,264 @@ listener.start()
 # Set up world - the World object comes with sane defaults
 world = World()
 
-# Set up the asynchronous log configuration
+# Set up the asynchronous log configuration, data-driven
 # For details, see https://www.bitcraze.io/documentation/repository/crazyflie-firmware/master/api/logs/
-conf_list = []
-group_list = [
-    "stabilizer",
-    "pos",
-    "vel",
-    "acc",
-    "attitude_rate",
-    "motor",
-    "motor_req",
-    "gyro",
-    "target_pos",
-    "target_vel",
-    "controller_cmd",
-    "controller_attitude",
-    "controller_attitude_rate",
-]
-for group in group_list:
-    logconf = LogConfig(name=group, period_in_ms=sampling_rate * 1000)
-    if group == "stabilizer":
-        logconf.add_variable("stabilizer.roll", "float")  # Same as stateEstimate.roll
-        logconf.add_variable("stabilizer.pitch", "float")  # Same as stateEstimate.pitch
-        logconf.add_variable("stabilizer.yaw", "float")  # Same as stateEstimate.yaw
-        logconf.add_variable("stabilizer.thrust", "float")  # Current thrust
-    if group == "pos":
-        logconf.add_variable("stateEstimate.x", "float")
-        logconf.add_variable("stateEstimate.y", "float")
-        logconf.add_variable("stateEstimate.z", "float")
-    if group == "vel":
-        logconf.add_variable("stateEstimate.vx", "float")
-        logconf.add_variable("stateEstimate.vy", "float")
-        logconf.add_variable("stateEstimate.vz", "float")
-    if group == "acc":
-        logconf.add_variable("stateEstimate.ax", "float")
-        logconf.add_variable("stateEstimate.ay", "float")
-        logconf.add_variable("stateEstimate.az", "float")
-    if group == "attitude_rate":
-        logconf.add_variable("stateEstimateZ.rateRoll", "float")
-        logconf.add_variable("stateEstimateZ.ratePitch", "float")
-        logconf.add_variable("stateEstimateZ.rateYaw", "float")
-    if group == "motor":
-        logconf.add_variable("motor.m1", "float")
-        logconf.add_variable("motor.m2", "float")
-        logconf.add_variable("motor.m3", "float")
-        logconf.add_variable("motor.m4", "float")
-    if group == "motor_req":
-        logconf.add_variable("motor.m1req", "float")
-        logconf.add_variable("motor.m2req", "float")
-        logconf.add_variable("motor.m3req", "float")
-        logconf.add_variable("motor.m4req", "float")
-    if group == "gyro":
-        logconf.add_variable("gyro.x", "float")
-        logconf.add_variable("gyro.y", "float")
-        logconf.add_variable("gyro.z", "float")
-    if group == "target_pos":
-        logconf.add_variable("ctrltarget.x", "float")
-        logconf.add_variable("ctrltarget.y", "float")
-        logconf.add_variable("ctrltarget.z", "float")
-    if group == "target_vel":
-        logconf.add_variable("ctrltarget.vx", "float")
-        logconf.add_variable("ctrltarget.vy", "float")
-        logconf.add_variable("ctrltarget.vz", "float")
-    # if group == "target_attitude":
-    #    logconf.add_variable('ctrltarget.roll', 'float')
-    #    logconf.add_variable('ctrltarget.pitch', 'float')
-    #    logconf.add_variable('ctrltarget.yaw', 'float')
-    if group == "controller_cmd":
-        logconf.add_variable("controller.cmd_thrust", "float")
-        logconf.add_variable("controller.cmd_roll", "float")
-        logconf.add_variable("controller.cmd_pitch", "float")
-        logconf.add_variable("controller.cmd_yaw", "float")
-    if group == "controller_attitude":
-        logconf.add_variable("controller.roll", "float")
-        logconf.add_variable("controller.pitch", "float")
-        logconf.add_variable("controller.yaw", "float")
-    if group == "controller_attitude_rate":
-        logconf.add_variable("controller.rollRate", "float")
-        logconf.add_variable("controller.pitchRate", "float")
-        logconf.add_variable("controller.yawRate", "float")
-    conf_list.append(logconf)
+GROUPS = {
+    "stabilizer": [
+        ("stabilizer.roll", "float"),  # Same as stateEstimate.roll
+        ("stabilizer.pitch", "float"),  # Same as stateEstimate.pitch
+        ("stabilizer.yaw", "float"),  # Same as stateEstimate.yaw
+        ("stabilizer.thrust", "float"),  # Current thrust
+    ],
+    "pos": [
+        ("stateEstimate.x", "float"),
+        ("stateEstimate.y", "float"),
+        ("stateEstimate.z", "float"),
+    ],
+    "vel": [
+        ("stateEstimate.vx", "float"),
+        ("stateEstimate.vy", "float"),
+        ("stateEstimate.vz", "float"),
+    ],
+    "acc": [
+        ("stateEstimate.ax", "float"),
+        ("stateEstimate.ay", "float"),
+        ("stateEstimate.az", "float"),
+    ],
+    "attitude_rate": [
+        ("stateEstimateZ.rateRoll", "float"),
+        ("stateEstimateZ.ratePitch", "float"),
+        ("stateEstimateZ.rateYaw", "float"),
+    ],
+    "motor": [
+        ("motor.m1", "float"),
+        ("motor.m2", "float"),
+        ("motor.m3", "float"),
+        ("motor.m4", "float"),
+    ],
+    "motor_req": [
+        ("motor.m1req", "float"),
+        ("motor.m2req", "float"),
+        ("motor.m3req", "float"),
+        ("motor.m4req", "float"),
+    ],
+    "gyro": [
+        ("gyro.x", "float"),
+        ("gyro.y", "float"),
+        ("gyro.z", "float"),
+    ],
+    "target_pos": [
+        ("ctrltarget.x", "float"),
+        ("ctrltarget.y", "float"),
+        ("ctrltarget.z", "float"),
+    ],
+    "target_vel": [
+        ("ctrltarget.vx", "float"),
+        ("ctrltarget.vy", "float"),
+        ("ctrltarget.vz", "float"),
+    ],
+    # "target_attitude": [
+    #     ("ctrltarget.roll", "float"),
+    #     ("ctrltarget.pitch", "float"),
+    #     ("ctrltarget.yaw", "float"),
+    # ],
+    "controller_cmd": [
+        ("controller.cmd_thrust", "float"),
+        ("controller.cmd_roll", "float"),
+        ("controller.cmd_pitch", "float"),
+        ("controller.cmd_yaw", "float"),
+    ],
+    "controller_attitude": [
+        ("controller.roll", "float"),
+        ("controller.pitch", "float"),
+        ("controller.yaw", "float"),
+    ],
+    "controller_attitude_rate": [
+        ("controller.rollRate", "float"),
+        ("controller.pitchRate", "float"),
+        ("controller.yawRate", "float"),
+    ],
+}
+# A CRTP log packet carries ~26 bytes of payload, i.e. at most 6 floats
+MAX_VARS_PER_BLOCK = 6
+
+# PID gains recorded alongside the flight data
+PID_PARAM_GROUPS = {
+    "pid_rate": [
+        "roll_kp",
+        "roll_ki",
+        "roll_kd",
+        "pitch_kp",
+        "pitch_ki",
+        "pitch_kd",
+        "yaw_kp",
+        "yaw_ki",
+        "yaw_kd",
+    ],
+    "pid_attitude": [
+        "roll_kp",
+        "roll_ki",
+        "roll_kd",
+        "pitch_kp",
+        "pitch_ki",
+        "pitch_kd",
+        "yaw_kp",
+        "yaw_ki",
+        "yaw_kd",
+    ],
+    "velCtlPid": [
+        "vxKp",
+        "vxKi",
+        "vxKd",
+        "vyKp",
+        "vyKi",
+        "vyKd",
+        "vzKp",
+        "vzKi",
+        "vzKd",
+    ],
+    "posCtlPid": [
+        "xKp",
+        "xKi",
+        "xKd",
+        "yKp",
+        "yKi",
+        "yKd",
+        "zKp",
+        "zKi",
+        "zKd",
+    ],
+}
+
+
+def pack_log_blocks(groups, period_in_ms, max_vars=MAX_VARS_PER_BLOCK):
+    """
+    Greedily pack whole log groups into shared LogConfig blocks, each
+    holding at most max_vars floats, so fewer radio packets are sent per
+    period than with one block per group.
+
+    Returns a list of (logconf, group_names) pairs.
+    """
+    bins = []
+    for name, variables in groups.items():
+        for entry in bins:
+            if entry[1] + len(variables) <= max_vars:
+                entry[0].append(name)
+                entry[1] += len(variables)
+                break
+        else:
+            bins.append([[name], len(variables)])
+    blocks = []
+    for names, _ in bins:
+        logconf = LogConfig(name="+".join(names), period_in_ms=period_in_ms)
+        for group in names:
+            for var, vartype in groups[group]:
+                logconf.add_variable(var, vartype)
+        blocks.append((logconf, names))
+    return blocks
+
+
+blocks = pack_log_blocks(GROUPS, _PERIOD_MS)
+conf_list = [logconf for logconf, _ in blocks]
+group_list = list(GROUPS)
 
 # Prepare for liftoff
 with QualisysCrazyflie(
     cf_body_name, cf_uri, world, marker_ids=cf_marker_ids, qtm_ip=qtm_ip
 ) as qcf:
 
-    # Let there be time
-    t = time()
+    # Let there be time - monotonic integer clock, immune to NTP jumps
+    t0_ns = monotonic_ns()
+    period_ns = int(sampling_rate * 1e9)
     dt = 0
 
-    # Get and print the PID gains
+    # Get the PID gains, overlapping the blocking radio round-trips
+    # (a few ms each) instead of issuing all 36 requests sequentially
+    param_names = [
+        f"{group}.{name}" for group, names in PID_PARAM_GROUPS.items() for name in names
+    ]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        values = dict(zip(param_names, pool.map(qcf.cf.param.get_value, param_names)))
     pid_gains = {
-        "pid_rate": {
-            "roll_kp": qcf.cf.param.get_value("pid_rate.roll_kp"),
-            "roll_ki": qcf.cf.param.get_value("pid_rate.roll_ki"),
-            "roll_kd": qcf.cf.param.get_value("pid_rate.roll_kd"),
-            "pitch_kp": qcf.cf.param.get_value("pid_rate.pitch_kp"),
-            "pitch_ki": qcf.cf.param.get_value("pid_rate.pitch_ki"),
-            "pitch_kd": qcf.cf.param.get_value("pid_rate.pitch_kd"),
-            "yaw_kp": qcf.cf.param.get_value("pid_rate.yaw_kp"),
-            "yaw_ki": qcf.cf.param.get_value("pid_rate.yaw_ki"),
-            "yaw_kd": qcf.cf.param.get_value("pid_rate.yaw_kd"),
-        },
-        "pid_attitude": {
-            "roll_kp": qcf.cf.param.get_value("pid_attitude.roll_kp"),
-            "roll_ki": qcf.cf.param.get_value("pid_attitude.roll_ki"),
-            "roll_kd": qcf.cf.param.get_value("pid_attitude.roll_kd"),
-            "pitch_kp": qcf.cf.param.get_value("pid_attitude.pitch_kp"),
-            "pitch_ki": qcf.cf.param.get_value("pid_attitude.pitch_ki"),
-            "pitch_kd": qcf.cf.param.get_value("pid_attitude.pitch_kd"),
-            "yaw_kp": qcf.cf.param.get_value("pid_attitude.yaw_kp"),
-            "yaw_ki": qcf.cf.param.get_value("pid_attitude.yaw_ki"),
-            "yaw_kd": qcf.cf.param.get_value("pid_attitude.yaw_kd"),
-        },
-        "velCtlPid": {
-            "vxKp": qcf.cf.param.get_value("velCtlPid.vxKp"),
-            "vxKi": qcf.cf.param.get_value("velCtlPid.vxKi"),
-            "vxKd": qcf.cf.param.get_value("velCtlPid.vxKd"),
-            "vyKp": qcf.cf.param.get_value("velCtlPid.vyKp"),
-            "vyKi": qcf.cf.param.get_value("velCtlPid.vyKi"),
-            "vyKd": qcf.cf.param.get_value("velCtlPid.vyKd"),
-            "vzKp": qcf.cf.param.get_value("velCtlPid.vzKp"),
-            "vzKi": qcf.cf.param.get_value("velCtlPid.vzKi"),
-            "vzKd": qcf.cf.param.get_value("velCtlPid.vzKd"),
-        },
-        "posCtlPid": {
-            "xKp": qcf.cf.param.get_value("posCtlPid.xKp"),
-            "xKi": qcf.cf.param.get_value("posCtlPid.xKi"),
-            "xKd": qcf.cf.param.get_value("posCtlPid.xKd"),
-            "yKp": qcf.cf.param.get_value("posCtlPid.yKp"),
-            "yKi": qcf.cf.param.get_value("posCtlPid.yKi"),
-            "yKd": qcf.cf.param.get_value("posCtlPid.yKd"),
-            "zKp": qcf.cf.param.get_value("posCtlPid.zKp"),
-            "zKi": qcf.cf.param.get_value("posCtlPid.zKi"),
-            "zKd": qcf.cf.param.get_value("posCtlPid.zKd"),
-        },
+        group: {name: values[f"{group}.{name}"] for name in names}
+        for group, names in PID_PARAM_GROUPS.items()
     }
     data["pid_gains"] = pid_gains
 
-    for group in group_list:
-        data[group] = []
+    # Preallocate one fixed-capacity ring buffer per log group, sized from
+    # the flight duration; the callback writes rows by index (wrapping when
+    # full) so memory stays bounded no matter how long the flight runs
+    n_max = int(flight_sec / sampling_rate) + 100
+    data_bufs = {}
+    data_counts = {}
+    for group, variables in GROUPS.items():
+        data_bufs[group] = np.empty((n_max, len(variables)), dtype=np.float32)
+        data_counts[group] = 0
     data["time"] = []
+    writer = threading.Thread(
+        target=drain_records,
+        args=(record_queue, "test_data_stream.jsonl"),
+        daemon=True,
+    )
+    writer.start()
     for logconf in conf_list:
         qcf.cf.log.add_config(logconf)
-    for group, logconf in zip(group_list, conf_list):
-        callback = partial(log_callback, data_log=data, key=group)
+    for logconf, names in blocks:
+        callback = LogCallback(
+            data_bufs,
+            data_counts,
+            [(group, [var for var, _ in GROUPS[group]]) for group in names],
+        )
         logconf.data_received_cb.add_callback(callback)
         logconf.start()
 
+    # Set target - the angle is a constant 0.0, so the offset and the
+    # target pose never change; build them once instead of every tick
+    _x, _y = utils.pol2cart(circle_radius, 0.0)
+    target = Pose(world.origin.x + _x, world.origin.y + _y, 1.0, yaw=90.0)
+
     # MAIN LOOP WITH SAFETY CHECK
-    while qcf.is_safe():
+    # Pace the loop at the control rate instead of spinning a core
+    next_tick_ns = t0_ns + period_ns
+    # Terminate upon Esc command
+    while qcf.is_safe() and not stop_event.is_set():
 
-        # Terminate upon Esc command
-        if last_key_pressed == pynput.keyboard.Key.esc:
-            break
         # Mind the clock
-        dt = time() - t
+        dt = (monotonic_ns() - t0_ns) * 1e-9
 
-        if dt < 40:
+        if dt < flight_sec:
             print(f"[t={dt}]")
-            # Set target
-            _x, _y = utils.pol2cart(circle_radius, 0.0)
-            target = Pose(world.origin.x + _x, world.origin.y + _y, 1.0, yaw=90.0)
         else:
             break
 
+        dt_sleep = (next_tick_ns - monotonic_ns()) * 1e-9
+        if dt_sleep > 0:
+            sleep(dt_sleep)
+        next_tick_ns += period_ns
+
     # Stop logging data from the flapper firmware
     for logconf in conf_list:
         logconf.stop()
+    try:
+        record_queue.put(None, timeout=5)
+    except queue.Full:
+        pass
+    writer.join(timeout=5)
+
+# Convert the filled portion of each ring buffer to plain lists once for
+# JSON, unrolling the wraparound if the flight outlasted the capacity
+for group in group_list:
+    buf = data_bufs[group]
+    count = data_counts[group]
+    if count > len(buf):
+        head = count % len(buf)
+        data[group] = np.concatenate((buf[head:], buf[:head])).tolist()
+    else:
+        data[group] = buf[:count].tolist()
 
-# Open a file in write mode and use json.dump() to write the dictionary to the file
-with open("test_data.json", "w") as file:
-    json.dump(data, file, indent=4)
+# Write the dictionary in a background thread so shutdown is not held up
+# by serialization; indent=4 was the slowest stdlib json path
+dump_thread = threading.Thread(target=write_json, args=(data, "test_data.json"))
+dump_thread.start()
 
-print("Dictionary has been saved to data.json")
+print("Dictionary is being saved to test_data.json")
@@ -4,9 +4,12 @@ Updated Crazyflie circular trajectory using remote target computation API
 
 import argparse
 import json
-from time import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic_ns, sleep
 
 import numpy as np
+import pynput
 from omegaconf import OmegaConf
 from pydantic import BaseModel
 
@@ -14,11 +17,32 @@ from api.schema import TargetRequest
 from api.service import get_target_position
 from qfly import Pose, QualisysCrazyflie, World
 
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # SETTINGS
 cf_body_name = "flapper2"
 cf_uri = "radio://0/80/2M/E7E7E7E7E7"
 cf_marker_ids = [1, 2, 3, 4]
 qtm_ip = "128.174.245.190"
+sampling_rate = 0.1  # Control loop period in seconds
+
+# Esc lands the drone at any time; the keyboard listener sets this event
+stop_event = threading.Event()
+# Key members are singletons, so an identity check suffices
+_ESC = pynput.keyboard.Key.esc
+# Identity rotation for the preflight check, built once
+_I3 = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))
+
+
+def on_press(key):
+    """React to keyboard."""
+    if key is _ESC:
+        stop_event.set()
 
 
 class FlapperConfig(BaseModel):
@@ -29,20 +53,25 @@ class FlapperConfig(BaseModel):
     tracking_sec: float  # seconds
 
 
-def calc_target(config: FlapperConfig, t: float):
-    theta = config.omega * t / 180 * np.pi
+def build_target_table(config: FlapperConfig, dt: float):
+    """
+    Precompute the full target trajectory as arrays indexed by tick,
+    so the control loop does an O(1) lookup instead of per-tick trig.
+    """
+    ts = np.arange(0, config.tracking_sec + dt, dt)
+    theta = config.omega * ts / 180 * np.pi
     if config.trajectory_type == "XZ":
         target_x = 0.5 * np.cos(theta)
-        target_y = 0.0
+        target_y = np.zeros_like(theta)
         target_z = 0.5 * np.sin(theta) + 1.00
     elif config.trajectory_type == "YZ":
-        target_x = 0.0
+        target_x = np.zeros_like(theta)
         target_y = 0.5 * np.cos(theta)
         target_z = 0.5 * np.sin(theta) + 1.00
     elif config.trajectory_type == "XY":
         target_x = np.cos(theta)
         target_y = np.sin(theta)
-        target_z = 1.00
+        target_z = np.full_like(theta, 1.00)
     elif config.trajectory_type == "XYZ":
         target_x = np.cos(theta)
         target_y = np.sin(theta)
@@ -54,18 +83,35 @@ def calc_target(config: FlapperConfig, t: float):
     return target_x, target_y, target_z
 
 
+def write_json(data, path):
+    """Dump the flight log compactly, off the control thread."""
+    if HAS_ORJSON:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data))
+    else:
+        with open(path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+
 def main(config):
+    # Listen to the keyboard
+    listener = pynput.keyboard.Listener(on_press=on_press)
+    listener.start()
+
     world = World(expanse=1.8, speed_limit=1.1)
+    # The origin never moves; locals are much cheaper than attribute
+    # chains in the control loop
+    ox, oy, oz = world.origin.x, world.origin.y, world.origin.z
+    table_x, table_y, table_z = build_target_table(config, sampling_rate)
     # preflight check
-    target_x, target_y, target_z = calc_target(config, 0)
     req = TargetRequest(
-        target_x=target_x,
-        target_y=target_y,
-        target_z=target_z,
-        cur_x=world.origin.x,
-        cur_y=world.origin.y,
+        target_x=table_x[0],
+        target_y=table_y[0],
+        target_z=table_z[0],
+        cur_x=ox,
+        cur_y=oy,
         cur_z=1.0,
-        rot_mat=[[1, 0, 0], [0, 1, 0], [0, 0, 1]],
+        rot_mat=_I3,
     )
     target, status = get_target_position(req)
     if status != "OK":
@@ -75,86 +121,141 @@ def main(config):
     with QualisysCrazyflie(
         cf_body_name, cf_uri, world, marker_ids=cf_marker_ids, qtm_ip=qtm_ip
     ) as qcf:
-        t0 = time()
-        data = {"pose": [], "time": [], "control": []}
+        # Monotonic integer clock: immune to NTP jumps and cheaper than
+        # time.time(), with no float cancellation as the flight runs long
+        t0_ns = monotonic_ns()
+        period_ns = int(sampling_rate * 1e9)
+        # Preallocate fixed-capacity log buffers sized from the flight
+        # duration; writing by index avoids growing Python lists in the
+        # control loop
+        n_max = int((config.takeoff_sec + config.tracking_sec) / sampling_rate) + 100
+        pose_buf = np.empty((n_max, 3), dtype=np.float32)
+        time_buf = np.empty(n_max, dtype=np.float64)
+        ctrl_buf = np.empty((n_max, 3), dtype=np.float32)
+        idx = 0
+        # Stream one record per tick to a JSONL file opened once outside
+        # the loop; the combined JSON is dumped once after landing.
+        log_file = open("koopman_data.jsonl", "w")
+        # Pipeline the remote target RPC: each tick submits its request
+        # and consumes the reply submitted the tick before, so the HTTP
+        # latency hides behind the loop sleep instead of extending it
+        rpc = ThreadPoolExecutor(max_workers=1)
+        pending = None
         # (logging setup omitted for brevity)
 
-        while qcf.is_safe():
-            t = time() - t0
+        # Pace the loop at the control rate instead of spinning a core
+        next_tick_ns = t0_ns + period_ns
+        # Esc breaks out to the landing sequence
+        while qcf.is_safe() and not stop_event.is_set():
+            t = (monotonic_ns() - t0_ns) * 1e-9
+            # Bind the pose once per tick instead of re-reading the
+            # attribute for every coordinate
+            p = qcf.pose
 
             if t < config.takeoff_sec:
-                target = Pose(world.origin.x, world.origin.y, 1.0)
+                target = Pose(ox, oy, 1.0)
             elif t < config.takeoff_sec + config.tracking_sec:
                 # fetch from remote service
-                target_x, target_y, target_z = calc_target(
-                    config, t - config.takeoff_sec
-                )
-                req = TargetRequest(
-                    target_x=target_x + world.origin.x,
-                    target_y=target_y + world.origin.y,
-                    target_z=target_z + world.origin.z,
-                    cur_x=qcf.pose.x - world.origin.x,
-                    cur_y=qcf.pose.y - world.origin.y,
-                    cur_z=qcf.pose.z - world.origin.z,
-                    rot_mat=qcf.pose.rotmatrix,
+                i = min(int((t - config.takeoff_sec) / sampling_rate), len(table_x) - 1)
+                # model_construct skips field validation, which is safe
+                # here because every value comes from the precomputed
+                # table or the SDK pose, and saves microseconds per tick
+                req = TargetRequest.model_construct(
+                    target_x=table_x[i] + ox,
+                    target_y=table_y[i] + oy,
+                    target_z=table_z[i] + oz,
+                    cur_x=p.x - ox,
+                    cur_y=p.y - oy,
+                    cur_z=p.z - oz,
+                    rot_mat=p.rotmatrix,
                 )
-                target, status = get_target_position(req)
+                future = rpc.submit(get_target_position, req)
+                # The first tracking tick has no reply in flight yet
+                target, status = (pending or future).result()
+                pending = future
                 if status != "OK":
                     print(f"Error: {status}")
                     break
-                if qcf.pose.z > 2.5:
+                if p.z > 2.5:
                     break
             else:
                 break
             qcf.safe_position_setpoint(target)
             # log data
-            print(f"[t={t}] Pose - {qcf.pose}")
+            print(f"[t={t}] Pose - {p}")
             print(f"[t={t}] Target - {target}")
 
-            data["pose"].append(
-                [
-                    qcf.pose.x - world.origin.x,
-                    qcf.pose.y - world.origin.y,
-                    qcf.pose.z - world.origin.z,
-                ]
-            )
-            data["time"].append(t)
-            data["control"].append(
-                [
-                    target.x - world.origin.x,
-                    target.y - world.origin.y,
-                    target.z - world.origin.z,
-                ]
+            pose = [p.x - ox, p.y - oy, p.z - oz]
+            control = [target.x - ox, target.y - oy, target.z - oz]
+            if idx < n_max:
+                pose_buf[idx] = pose
+                time_buf[idx] = t
+                ctrl_buf[idx] = control
+                idx += 1
+
+            # Append only the newest record; flush periodically so a crash
+            # loses at most a few ticks of data
+            log_file.write(
+                json.dumps({"t": t, "pose": pose, "control": control}) + "\n"
             )
+            if idx % 10 == 0:
+                log_file.flush()
 
-            # Open a file in write mode and use json.dump() to write the dictionary to the file
-            with open("koopman_data.json", "w") as file:
-                json.dump(data, file, indent=4)
+            dt_sleep = (next_tick_ns - monotonic_ns()) * 1e-9
+            if dt_sleep > 0:
+                sleep(dt_sleep)
+            next_tick_ns += period_ns
+        rpc.shutdown(wait=False)
+        log_file.close()
+
+        # Write the combined dictionary once, in the background, so the
+        # serialization does not delay the landing sequence
+        data = {
+            "pose": pose_buf[:idx].tolist(),
+            "time": time_buf[:idx].tolist(),
+            "control": ctrl_buf[:idx].tolist(),
+        }
+        dump_thread = threading.Thread(
+            target=write_json, args=(data, "koopman_data.json")
+        )
+        dump_thread.start()
         # Land
         first_z = qcf.pose.z
         landing_time = 5
-        start_time = time()
+        # One clock read per tick: the centering deadline and the glide
+        # fraction both derive from the same integer timestamp
+        start_ns = monotonic_ns()
+        center_deadline_ns = start_ns + 5_000_000_000
+        landing_time_ns = int(landing_time * 1e9)
+        next_tick_ns = start_ns + period_ns
         while qcf.is_safe():
-            if time() - start_time < 5:
+            now_ns = monotonic_ns()
+            if now_ns < center_deadline_ns:
                 print(f"[t={t}] Maneuvering - Center...")
                 # Set target
-                target = Pose(world.origin.x, world.origin.y, 1.0)
+                target = Pose(ox, oy, 1.0)
                 # Engage
                 qcf.safe_position_setpoint(target)
-            elif qcf.pose.z - world.origin.z > 0.40:
+            elif qcf.pose.z - oz > 0.40:
                 print(qcf.pose.z)
                 print("landing...")
-                cur_time = time()
                 target = Pose(
-                    world.origin.x,
-                    world.origin.y,
-                    max(-0.20, first_z * (1 - (cur_time - start_time) / landing_time)),
+                    ox,
+                    oy,
+                    max(-0.20, first_z * (1 - (now_ns - start_ns) / landing_time_ns)),
                 )
                 qcf.safe_position_setpoint(target)
             else:
                 print("landed")
                 break
 
+            dt_sleep = (next_tick_ns - monotonic_ns()) * 1e-9
+            if dt_sleep > 0:
+                sleep(dt_sleep)
+            next_tick_ns += period_ns
+
+    dump_thread.join()
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Flapper Config")
@@ -35,6 +35,12 @@ try:
 except ImportError:
     HAS_MATPLOTLIB = False
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 
 @dataclass
 class ConformalKoopmanParams:
@@ -61,6 +67,19 @@ class TrackingErrorBounds:
     exponential_decay_rate: float  # gamma^K
 
 
+# Trajectory shapes as a dispatch table keyed by type, mirroring
+# solo_koopman_conformal_circle.py; each entry maps theta to (x, y, z)
+# (XY-plane types use a 1.0 m radius). math.cos/sin avoid the ufunc
+# dispatch np.cos/np.sin pays on Python scalars.
+_TRAJECTORY_FUNCS = {
+    "XZ": lambda theta: (0.5 * math.cos(theta), 0.0, 0.5 * math.sin(theta) + 1.00),
+    "YZ": lambda theta: (0.0, 0.5 * math.cos(theta), 0.5 * math.sin(theta) + 1.00),
+    "XY": lambda theta: (math.cos(theta), math.sin(theta), 1.00),
+    "XYZ": lambda theta: (math.cos(theta), math.sin(theta), 0.5 * math.sin(theta) + 1.00),
+    "XY2Z": lambda theta: (math.cos(theta), math.sin(theta), 0.30 * math.sin(2 * theta) + 1.00),
+}
+
+
 class ProbabilisticTrackingError:
     """
     Calculate probabilistic tracking error bounds using conformal prediction
@@ -71,7 +90,9 @@ class ProbabilisticTrackingError:
         self.params = params
     
     def load_trajectory_data(self, file_path: str) -> Dict:
-        """Load trajectory data from JSON file."""
+        """Load trajectory data from JSON file (orjson when available)."""
+        if HAS_ORJSON:
+            return orjson.loads(Path(file_path).read_bytes())
         with open(file_path, 'r') as f:
             return json.load(f)
     
@@ -136,35 +157,11 @@ class ProbabilisticTrackingError:
         Returns:
             target_x, target_y, target_z coordinates
         """
-        theta = omega * t / 180 * np.pi
-        
-        if trajectory_type == "XZ":
-            target_x = 0.5 * np.cos(theta)
-            target_y = 0.0
-            target_z = 0.5 * np.sin(theta) + 1.00
-        elif trajectory_type == "YZ":
-            target_x = 0.0
-            target_y = 0.5 * np.cos(theta)
-            target_z = 0.5 * np.sin(theta) + 1.00
-        elif trajectory_type == "XY":
-            target_x = 1.0 * np.cos(theta)  # Use 1.0 radius for XY plane
-            target_y = 1.0 * np.sin(theta)
-            target_z = 1.00
-        elif trajectory_type == "XYZ":
-            target_x = 1.0 * np.cos(theta)  # Use 1.0 radius for XY plane
-            target_y = 1.0 * np.sin(theta)
-            target_z = 0.5 * np.sin(theta) + 1.00
-        elif trajectory_type == "XY2Z":
-            target_x = 1.0 * np.cos(theta)  # Use 1.0 radius for XY plane
-            target_y = 1.0 * np.sin(theta)
-            target_z = 0.30 * np.sin(2 * theta) + 1.00
-        else:
-            # Default to XY trajectory
-            target_x = 1.0 * np.cos(theta)
-            target_y = 1.0 * np.sin(theta)
-            target_z = 1.00
-            
-        return target_x, target_y, target_z
+        theta = omega * t * (math.pi / 180.0)
+
+        # Unknown types fall back to the XY trajectory
+        func = _TRAJECTORY_FUNCS.get(trajectory_type, _TRAJECTORY_FUNCS["XY"])
+        return func(theta)
     
     def get_trajectory_type_from_filename(self, file_path: str) -> str:
         """
@@ -328,20 +325,23 @@ class ProbabilisticTrackingError:
         
         return max(0.0, delta_r)
     
-    def analyze_single_trajectory(self, file_path: str, 
-                                predicted_poses: Optional[np.ndarray] = None) -> TrackingErrorBounds:
+    def analyze_single_trajectory(self, file_path: str,
+                                predicted_poses: Optional[np.ndarray] = None,
+                                data: Optional[Dict] = None) -> TrackingErrorBounds:
         """
         Analyze a single trajectory file for probabilistic tracking error.
-        
+
         Args:
             file_path: Path to JSON trajectory file
             predicted_poses: Optional predicted poses for inverse embedding analysis
-            
+            data: Optional pre-loaded trajectory dict, to avoid re-parsing
+
         Returns:
             TrackingErrorBounds object with results
         """
         # Load and process data (takeoff phase is removed in extract_poses_and_targets)
-        data = self.load_trajectory_data(file_path)
+        if data is None:
+            data = self.load_trajectory_data(file_path)
         poses, targets, times = self.extract_poses_and_targets(data, file_path)
         
         # Calculate tracking errors
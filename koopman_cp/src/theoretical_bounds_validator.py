@@ -136,21 +136,24 @@ class TheoreticalBoundsValidator:
         
         return stats
     
-    def validate_single_trajectory(self, file_path: str) -> ValidationResults:
+    def validate_single_trajectory(self, file_path: str,
+                                   data: Optional[Dict] = None) -> ValidationResults:
         """
         Validate theoretical bounds for a single trajectory.
-        
+
         Args:
             file_path: Path to trajectory JSON file
-            
+            data: Optional pre-loaded trajectory dict, to avoid re-parsing
+
         Returns:
             ValidationResults object with comprehensive validation data
         """
+        # Load the trajectory once and reuse it for analysis and checks
+        if data is None:
+            data = self.analyzer.load_trajectory_data(file_path)
+
         # Analyze trajectory and get bounds
-        bounds = self.analyzer.analyze_single_trajectory(file_path)
-        
-        # Load and process trajectory data
-        data = self.analyzer.load_trajectory_data(file_path)
+        bounds = self.analyzer.analyze_single_trajectory(file_path, data=data)
         poses, targets, times = self.analyzer.extract_poses_and_targets(data)
         
         # Remove liftoff phase
@@ -186,23 +189,49 @@ class TheoreticalBoundsValidator:
             validation_passed=validation_passed
         )
     
-    def plot_trajectory_with_bounds(self, file_path: str, save_path: Optional[str] = None):
+    def validate_and_plot(self, file_path: str,
+                          plot_path: Optional[str] = None) -> ValidationResults:
+        """
+        Validate a trajectory and render its plot in a single pass.
+
+        The trajectory JSON is parsed once and shared between validation
+        and plotting, instead of each step re-reading the file.
+
+        Args:
+            file_path: Path to trajectory JSON file
+            plot_path: Optional path to save the plot
+
+        Returns:
+            ValidationResults for the trajectory
+        """
+        data = self.analyzer.load_trajectory_data(file_path)
+        results = self.validate_single_trajectory(file_path, data=data)
+        if HAS_MATPLOTLIB:
+            self.plot_trajectory_with_bounds(file_path, plot_path,
+                                             data=data, results=results)
+        return results
+
+    def plot_trajectory_with_bounds(self, file_path: str, save_path: Optional[str] = None,
+                                    data: Optional[Dict] = None,
+                                    results: Optional[ValidationResults] = None):
         """
         Plot trajectory with theoretical error bounds.
-        
+
         Args:
             file_path: Path to trajectory JSON file
             save_path: Optional path to save plot
+            data: Optional pre-loaded trajectory dict, to avoid re-parsing
+            results: Optional pre-computed ValidationResults for the file
         """
         if not HAS_MATPLOTLIB:
             print("Matplotlib not available. Skipping plot generation.")
             return
-        
-        # Get validation results
-        results = self.validate_single_trajectory(file_path)
-        
-        # Load trajectory data
-        data = self.analyzer.load_trajectory_data(file_path)
+
+        # Load the trajectory once; validate only if not already done
+        if data is None:
+            data = self.analyzer.load_trajectory_data(file_path)
+        if results is None:
+            results = self.validate_single_trajectory(file_path, data=data)
         poses, targets, times = self.analyzer.extract_poses_and_targets(data)
         
         # Remove liftoff phase
@@ -7,10 +7,27 @@ by plotting error bands around target trajectories and calculating the
 empirical probability that actual trajectories stay within these bounds.
 """
 
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from theoretical_bounds_validator import TheoreticalBoundsValidator, ConformalKoopmanParams
 
 
+def _validate_and_plot_one(args):
+    """Validate one trajectory and render its plot in a worker process."""
+    file_path, plot_path, params, tolerance = args
+    # Force the non-interactive backend; workers have no GUI event loop.
+    # Without matplotlib validate_and_plot still runs the validation and
+    # just skips the plot, so degrade gracefully like the validator does.
+    try:
+        import matplotlib
+        matplotlib.use('Agg', force=True)
+    except ImportError:
+        pass
+    validator = TheoreticalBoundsValidator(params, tolerance=tolerance)
+    return validator.validate_and_plot(file_path, plot_path)
+
+
 def main():
     """Run bounds validation example for issue #6."""
     
@@ -81,27 +98,35 @@ def main():
     # except Exception as e:
     #     print(f"⚠️  Could not create plot: {e}")
     
-    # Validate all trajectories for summary
-    print(f"\n📋 Summary validation for all {len(json_files)} trajectories:")
+    # Validate and plot all trajectories in one pass: each worker parses
+    # a file once and produces both the result and its PNG
+    print(f"\n📋 Validating and plotting all {len(json_files)} trajectories:")
     print("-" * 60)
-    
-    all_results = validator.validate_multiple_trajectories([str(f) for f in json_files])
-    
+
+    jobs = [
+        (str(f), str(data_path / f"validation_{f.stem}.png"), params, validator.tolerance)
+        for f in json_files
+    ]
+    all_results = []
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {executor.submit(_validate_and_plot_one, job): Path(job[0]) for job in jobs}
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                all_results.append(future.result())
+                print(f"  ✓ Validated and plotted: {file_path.name}")
+            except Exception as e:
+                print(f"  ✗ Error processing {file_path.name}: {e}")
+
+    if not all_results:
+        print("❌ No trajectories could be validated")
+        return
+
     passed_count = sum(1 for r in all_results if r.validation_passed)
-    
+
     print(f"Overall results: {passed_count}/{len(all_results)} trajectories passed")
     print(f"Success rate: {passed_count/len(all_results)*100:.1f}%")
     
-    # Create plots for all trajectories
-    print(f"\n📈 Generating plots for all {len(json_files)} trajectories...")
-    for file_path in json_files:
-        try:
-            plot_path = data_path / f"validation_{file_path.stem}.png"
-            validator.plot_trajectory_with_bounds(str(file_path), str(plot_path))
-            print(f"  ✓ Plot saved: {plot_path.name}")
-        except Exception as e:
-            print(f"  ✗ Error plotting {file_path.name}: {e}")
-    
     # Key findings
     empirical_probs = [r.empirical_probability for r in all_results]
     mean_empirical = sum(empirical_probs) / len(empirical_probs)